@@ -8,6 +8,7 @@
 #   https://www.gnu.org/licenses/gpl-3.0.en.html
 
 import ast
+import functools
 import importlib
 import logging
 import marshal
@@ -16,10 +17,9 @@ import sys
 import tokenize as tk
 
 import openpyxl.formula.tokenizer as tokenizer
-from networkx.classes.digraph import DiGraph
-from networkx.exception import NetworkXError
 
 from pycel.excelutil import (
+    AddressCell,
     AddressMultiAreaRange,
     AddressRange,
     build_operator_operand_fixup,
@@ -29,6 +29,8 @@ from pycel.excelutil import (
     in_array_formula_context,
     NAME_ERROR,
     PyCelException,
+    R1C1_RANGE_RE,
+    TABLE_REF_RE,
     uniqueify,
 )
 from pycel.lib.function_helpers import load_functions
@@ -37,6 +39,12 @@ from pycel.lib.function_info import func_status_msg
 
 ADDR_FUNCS_NAMES = '_R_', '_C_', '_REF_'
 
+# Token.flags bits, precomputed from the token type and subtype
+F_OP = 1
+F_FUNCOPEN = 2
+F_OPEN = 4
+F_CLOSE = 8
+
 
 class FormulaParserError(PyCelException):
     """Error during parsing"""
@@ -53,63 +61,101 @@ class FormulaEvalError(PyCelException):
 class Tokenizer(tokenizer.Tokenizer):
     """Amend openpyxl tokenizer"""
 
+    # (type, subtype) of tokens which can surround an intersect operator
+    _INTERSECT_LHS = frozenset((
+        (tokenizer.Token.FUNC, tokenizer.Token.CLOSE),
+        (tokenizer.Token.PAREN, tokenizer.Token.CLOSE),
+    ))
+    _INTERSECT_RHS = frozenset((
+        (tokenizer.Token.FUNC, tokenizer.Token.OPEN),
+        (tokenizer.Token.PAREN, tokenizer.Token.OPEN),
+    ))
+
     def __init__(self, formula):
         super(Tokenizer, self).__init__(formula)
         self.items = self._items()
 
     def _items(self):
         """Convert to use our Token"""
-        t = [None] + [Token.from_token(t) for t in self.items] + [None]
+        t = [Token.from_token(t) for t in self.items]
+        last = len(t) - 1
+
+        intersect_lhs = self._INTERSECT_LHS
+        intersect_rhs = self._INTERSECT_RHS
+        WSPACE = Token.WSPACE
+        OPERAND = Token.OPERAND
+        RANGE = Token.RANGE
+        FUNC = Token.FUNC
+        OPEN = Token.OPEN
+        OP_IN = Token.OP_IN
+        OP_PRE = Token.OP_PRE
 
         # convert or remove unneeded whitespace
         tokens = []
-        for prev_token, token, next_token in zip(t, t[1:], t[2:]):
-            if token.type != Token.WSPACE or not prev_token or not next_token:
+        append = tokens.append
+        for i, token in enumerate(t):
+            if token.type != WSPACE or i == 0 or i == last:
                 # ::HACK:: this is code to make the tokenizer behave like
                 # this change to the openpyxl tokenizer.
                 # https://bitbucket.org/openpyxl/openpyxl/pull-requests/345
                 # If the pull request gets merged, we can the update our
                 # openpyxl requirements and remove this code.
-                if (token.matches(type_=Token.FUNC, subtype=Token.OPEN) and
+                if (token.type == FUNC and token.subtype == OPEN and
                         ':' in token.value):
 
                     # split the address on the ':'
                     addr, func = token.value.rsplit(':', maxsplit=1)
-                    tokens.append(Token(addr, Token.OPERAND, Token.RANGE))
-                    tokens.append(Token(':', Token.OP_IN, ''))
-                    token.value = func
-                    tokens.append(token)
+                    append(Token(addr, OPERAND, RANGE))
+                    append(Token(':', OP_IN, ''))
+                    append(Token.from_token(token, value=func))
 
-                elif (token.matches(type_=Token.OPERAND,
-                                    subtype=Token.RANGE) and
+                elif (token.type == OPERAND and token.subtype == RANGE and
                       token.value.startswith(':')):
                     # split the address on the ':'
-                    tokens.append(Token(':', Token.OP_IN, ''))
-                    token.value = token.value[1:]
-                    tokens.append(token)
+                    append(Token(':', OP_IN, ''))
+                    append(Token.from_token(token, value=token.value[1:]))
 
                 # drop unary +
-                elif not token.matches(type_=Token.OP_PRE, value='+'):
-                    tokens.append(token)
-
-            elif (
-                prev_token.matches(type_=Token.FUNC, subtype=Token.CLOSE) or
-                prev_token.matches(type_=Token.PAREN, subtype=Token.CLOSE) or
-                prev_token.type == Token.OPERAND
-            ) and (
-                next_token.matches(type_=Token.FUNC, subtype=Token.OPEN) or
-                next_token.matches(type_=Token.PAREN, subtype=Token.OPEN) or
-                next_token.type == Token.OPERAND
-            ):
-                # this whitespace is an intersect operator
-                tokens.append(Token(token.value, Token.OP_IN, Token.INTERSECT))
+                elif token.type != OP_PRE or token.value != '+':
+                    append(token)
+
+            else:
+                prev_token = t[i - 1]
+                next_token = t[i + 1]
+                if (
+                    prev_token.type == OPERAND or
+                    (prev_token.type, prev_token.subtype) in intersect_lhs
+                ) and (
+                    next_token.type == OPERAND or
+                    (next_token.type, next_token.subtype) in intersect_rhs
+                ):
+                    # this whitespace is an intersect operator
+                    append(Token(token.value, OP_IN, Token.INTERSECT))
 
         return tokens
 
 
+@functools.lru_cache(maxsize=8192)
+def _tokenize(expression):
+    """Tokenize a formula, caching the results since formulas often repeat
+
+    The resulting tokens are shared between callers and must not be modified
+    """
+    return tuple(Tokenizer(expression).items)
+
+
+# Shared instances of short tokens (operators, separators, small operands...)
+# which are repeated across formulas.  Size limited to bound the memory used.
+_TOKEN_CACHE = {}
+_TOKEN_CACHE_MAX_VALUE_LEN = 4
+_TOKEN_CACHE_MAX_SIZE = 8192
+
+
 class Token(tokenizer.Token):
     """Amend openpyxl token"""
 
+    __slots__ = ('flags', '_func_name', '_precedence')
+
     INTERSECT = "INTERSECT"
     ARRAYROW = "ARRAYROW"
     EMPTY = "EMPTY"
@@ -117,15 +163,18 @@ class Token(tokenizer.Token):
     class Precedence:
         """Small wrapper class to manage operator precedence during parsing"""
 
+        __slots__ = ('precedence', 'associativity', 'push_key', 'pop_key')
+
         def __init__(self, precedence, associativity):
             self.precedence = precedence
             self.associativity = associativity
 
+            # integer keys such that `a < b` is `a.push_key < b.pop_key`
+            self.push_key = 2 * precedence + (associativity != "left")
+            self.pop_key = 2 * precedence + 1
+
         def __lt__(self, other):
-            return (self.precedence < other.precedence or
-                    self.associativity == "left" and
-                    self.precedence == other.precedence
-                    )
+            return self.push_key < other.pop_key
 
     precedences = {
         # http://office.microsoft.com/en-us/excel-help/
@@ -149,22 +198,67 @@ class Token(tokenizer.Token):
         '<>': Precedence(1, 'left'),
     }
 
+    def __init__(self, value, type_, subtype=""):
+        super(Token, self).__init__(value, type_, subtype)
+
+        flags = 0
+        if type_ in (Token.OP_PRE, Token.OP_IN, Token.OP_POST):
+            flags |= F_OP
+        if subtype == Token.OPEN:
+            flags |= F_OPEN
+            if type_ in (Token.FUNC, Token.ARRAY, Token.ARRAYROW):
+                flags |= F_FUNCOPEN
+        elif subtype == Token.CLOSE:
+            flags |= F_CLOSE
+        self.flags = flags
+
+        if flags & F_FUNCOPEN:
+            # normalize the function name for FunctionNode
+            func = value.lower().strip('(')
+            if func and func[0] == func[-1] == '_':
+                func = func.upper()
+            if func.startswith('_xlfn.'):
+                func = func[6:]
+            # interned, since it is used as a key for the handler lookups
+            self._func_name = sys.intern(func.replace('.', '_'))
+        else:
+            self._func_name = None
+
+        # looked up once here, rather than on every shunting-yard comparison
+        if flags & F_OP:
+            self._precedence = self.precedences.get(
+                'u' if type_ == Token.OP_PRE else value)
+        else:
+            self._precedence = None
+
     @classmethod
     def from_token(cls, token, value=None, type_=None, subtype=None):
-        return cls(
-            token.value if value is None else value,
-            token.type if type_ is None else type_,
-            token.subtype if subtype is None else subtype
-        )
+        """Build a token, sharing instances of short tokens
+
+        Tokens must not be modified, since they may be shared
+        """
+        value = token.value if value is None else value
+        type_ = token.type if type_ is None else type_
+        subtype = token.subtype if subtype is None else subtype
+
+        if len(value) > _TOKEN_CACHE_MAX_VALUE_LEN:
+            return cls(value, type_, subtype)
+
+        key = cls, value, type_, subtype
+        cached = _TOKEN_CACHE.get(key)
+        if cached is None:
+            cached = cls(value, type_, subtype)
+            if len(_TOKEN_CACHE) < _TOKEN_CACHE_MAX_SIZE:
+                _TOKEN_CACHE[key] = cached
+        return cached
 
     @property
     def is_operator(self):
-        return self.type in (Token.OP_PRE, Token.OP_IN, Token.OP_POST)
+        return bool(self.flags & F_OP)
 
     @property
     def is_funcopen(self):
-        return self.subtype == Token.OPEN and self.type in (
-            Token.FUNC, Token.ARRAY, Token.ARRAYROW)
+        return bool(self.flags & F_FUNCOPEN)
 
     def matches(self, type_=None, subtype=None, value=None):
         return ((type_ is None or self.type == type_) and
@@ -174,21 +268,25 @@ class Token(tokenizer.Token):
     @property
     def precedence(self):
         assert self.is_operator
-        return self.precedences[
-            'u' if self.type == Token.OP_PRE else self.value]
+        return self._precedence
 
 
 class ASTNode:
     """A generic node in the AST used to compile a cell's formula"""
 
+    __slots__ = ('token', 'cell', 'parent', 'children', '_descendants', '_emitted')
+
+    # avoids isinstance() checks when emitting an operator's parentheses
+    _is_function_node = False
+
     def __init__(self, token, cell=None):
         super(ASTNode, self).__init__()
         self.token = token
         self.cell = cell
-        self._ast = None
-        self._parent = None
-        self._children = None
+        self.parent = None
+        self.children = []
         self._descendants = None
+        self._emitted = None
 
     @classmethod
     def create(cls, token, cell=None):
@@ -199,10 +297,10 @@ class ASTNode:
             else:
                 return OperandNode(token, cell)
 
-        elif token.is_funcopen:
+        elif token.flags & F_FUNCOPEN:
             return FunctionNode(token, cell)
 
-        elif token.is_operator:
+        elif token.flags & F_OP:
             return OperatorNode(token, cell)
 
         raise FormulaParserError(f'Unknown token type: {repr(token)}')
@@ -213,14 +311,6 @@ class ASTNode:
     def __repr__(self):
         return f"{type(self).__name__}<{self.token.value.strip('(')}>"
 
-    @property
-    def ast(self):
-        return self._ast
-
-    @ast.setter
-    def ast(self, value):
-        self._ast = value
-
     @property
     def value(self):
         return self.token.value
@@ -233,38 +323,34 @@ class ASTNode:
     def subtype(self):
         return self.token.subtype
 
-    @property
-    def children(self):
-        if self._children is None:
-            try:
-                args = self.ast.predecessors(self)
-            except NetworkXError:
-                args = []
-            self._children = sorted(
-                args, key=lambda x: self.ast.nodes[x]['pos'])
-        # args.reverse()
-        return self._children
-
     @property
     def descendants(self):
         if self._descendants is None:
-            self._descendants = list(
-                n for n in self.ast.nodes(self) if n[0] != self)
+            # walk the tree depth first, without recursion or caching a
+            # descendants list on every node along the way
+            descendants = []
+            to_visit = self.children[::-1]
+            while to_visit:
+                node = to_visit.pop()
+                descendants.append(node)
+                to_visit.extend(reversed(node.children))
+            self._descendants = descendants
         return self._descendants
 
-    @property
-    def parent(self):
-        if self._parent is None:
-            self._parent = next(self.ast.successors(self), None)
-        return self._parent
-
     @property
     def emit(self):
-        """Emit code"""
+        """Emit code, cached since the node's cell and tree are fixed"""
+        if self._emitted is None:
+            self._emitted = self._emit()
+        return self._emitted
+
+    def _emit(self):
         return self.value
 
 
 class OperatorNode(ASTNode):
+    __slots__ = ()
+
     op_map = {
         # convert the operator to python equivalents
         "^": "**",
@@ -272,8 +358,7 @@ class OperatorNode(ASTNode):
         "<>": "!=",
     }
 
-    @property
-    def emit(self):
+    def _emit(self):
         xop = self.value
 
         # Get the arguments
@@ -305,16 +390,16 @@ class OperatorNode(ASTNode):
             ss = f'{args[0].emit}{op} {args[1].emit}'
 
         # avoid needless parentheses
-        if parent and not isinstance(parent, FunctionNode):
-            ss = "(" + ss + ")"
+        if parent and not parent._is_function_node:
+            ss = f'({ss})'
 
         return ss
 
 
 class OperandNode(ASTNode):
+    __slots__ = ()
 
-    @property
-    def emit(self):
+    def _emit(self):
         if self.subtype == self.token.LOGICAL:
             return str(self.value.lower() == "true")
 
@@ -333,12 +418,43 @@ class OperandNode(ASTNode):
             return self.value
 
 
+@functools.lru_cache(maxsize=8192)
+def _emit_range(addr_str, sheet):
+    """Emit code for an address which can be resolved without a cell
+
+    Cell and range references are often repeated across a workbook, so cache
+    the results.  R1C1, structured, multi colon references and defined names
+    can depend on the cell, so are left to RangeNode.
+
+    :param addr_str: address with any '$' removed
+    :param sheet: sheet for the address, if not included
+    :return: the emitted code, or None if a cell is needed
+    """
+    addr = addr_str.rsplit('!', 1)[-1]
+    if (addr.count(':') > 1 or R1C1_RANGE_RE.match(addr) or
+            TABLE_REF_RE.match(addr)):
+        return None
+
+    try:
+        address = AddressRange.create(addr_str, sheet=sheet)
+    except ValueError:
+        return None
+
+    if not isinstance(address, (AddressRange, AddressCell)):
+        return None
+    return RangeNode._emit_address(address)
+
+
 class RangeNode(OperandNode):
     """Represents a spreadsheet cell or range, e.g., A5 or B3:C20"""
 
-    @property
-    def emit(self):
-        return self._emit()
+    __slots__ = ()
+
+    @staticmethod
+    def _emit_address(address):
+        if address.is_range:
+            return f'_R_("{address}")'
+        return f'_C_("{address}")'
 
     def _emit(self, value=None):
         # resolve the range into cells
@@ -346,8 +462,12 @@ class RangeNode(OperandNode):
         value = value is not None and value or self.value
         if '!' in value:
             sheet = ''
+        addr_str = value.replace('$', '')
+        code = _emit_range(addr_str, sheet)
+        if code is not None:
+            return code
+
         try:
-            addr_str = value.replace('$', '')
             address = AddressRange.create(addr_str, sheet=sheet, cell=self.cell)
         except ValueError:
             # check for table relative address
@@ -368,8 +488,7 @@ class RangeNode(OperandNode):
         if isinstance(address, AddressMultiAreaRange):
             return ', '.join(self._emit(value=str(addr)) for addr in address)
         else:
-            template = '_R_("{}")' if address.is_range else '_C_("{}")'
-            return template.format(address)
+            return self._emit_address(address)
 
 
 class FunctionNode(ASTNode):
@@ -406,32 +525,40 @@ class FunctionNode(ASTNode):
         "xor": "xor_",
     }
 
+    # functions which need a special handler, mapped to the handler's name
+    _handlers = {
+        "pi": "func_pi",
+        "true": "func_true",
+        "false": "func_false",
+        "array": "func_array",
+        "arrayrow": "func_arrayrow",
+        "row": "func_row",
+        "column": "func_column",
+        "offset": "func_offset",
+        "indirect": "func_indirect",
+        "subtotal": "func_subtotal",
+    }
+
+    __slots__ = ('num_args',)
+
+    _is_function_node = True
+
     def __init__(self, *args):
         super(FunctionNode, self).__init__(*args)
         self.num_args = 0
 
-    def comma_join_emit(self, fmt_str=None, to_emit=None):
+    def comma_join_emit(self, to_emit=None):
         if to_emit is None:
             to_emit = self.children
-        if fmt_str is None:
-            return ", ".join(n.emit for n in to_emit)
-        else:
-            return ", ".join(fmt_str.format(n.emit) for n in to_emit)
+        return ", ".join(n.emit for n in to_emit)
 
-    @property
-    def emit(self):
-        func = self.value.lower().strip('(')
-
-        if func and func[0] == func[-1] == '_':
-            func = func.upper()
-        if func.startswith('_xlfn.'):
-            func = func[6:]
-        func = func.replace('.', '_')
+    def _emit(self):
+        func = self.token._func_name
 
         # if a special handler is needed
-        handler = getattr(self, f'func_{func}', None)
+        handler = self._handlers.get(func)
         if handler is not None:
-            return handler()
+            return getattr(self, handler)()
         else:
             # map to the correct name
             return f"{self.func_map.get(func, func)}({self.comma_join_emit()})"
@@ -452,7 +579,8 @@ class FunctionNode(ASTNode):
         return "False"
 
     def func_array(self):
-        return f"({self.comma_join_emit(fmt_str='({},)')},)"
+        rows = ", ".join(f"({n.emit},)" for n in self.children)
+        return f"({rows},)"
 
     def func_arrayrow(self):
         # simply create a list
@@ -476,7 +604,8 @@ class FunctionNode(ASTNode):
         return f'column({self._build_reference})'
 
     def func_offset(self):
-        to_emit = self.comma_join_emit().split(')', 1)[1]
+        # the reference is emitted by _build_reference, so only emit the rest
+        to_emit = ''.join(f', {n.emit}' for n in self.children[1:])
         return f'offset({self._build_reference}{to_emit})'
 
     def func_indirect(self):
@@ -515,7 +644,7 @@ class FunctionNode(ASTNode):
 
         func = self.SUBTOTAL_FUNCS[func_num]
 
-        to_emit = self.comma_join_emit(fmt_str="{}", to_emit=self.children[1:])
+        to_emit = self.comma_join_emit(to_emit=self.children[1:])
         return f'{func}({to_emit})'
 
 
@@ -638,6 +767,64 @@ class ExcelFormula:
     def _ast_node(self, token):
         return ASTNode.create(token, self.cell)
 
+    @staticmethod
+    def _rewrite_tokens(items):
+        """Amend the token stream to ease code production"""
+        OPERAND = Token.OPERAND
+        EMPTY = Token.EMPTY
+        PAREN = Token.PAREN
+        FUNC = Token.FUNC
+        ARRAY = Token.ARRAY
+        ARRAYROW = Token.ARRAYROW
+        SEP = Token.SEP
+        ARG = Token.ARG
+        ROW = Token.ROW
+        OPEN = Token.OPEN
+        CLOSE = Token.CLOSE
+
+        for token, next_token in zip(items, items[1:] + (None,)):
+            type_, subtype = token.type, token.subtype
+
+            if type_ == FUNC and subtype == OPEN:
+                yield token
+                token = Token('(', PAREN, OPEN)
+                if next_token.matches(SEP, ARG):
+                    yield token
+                    token = Token('', OPERAND, EMPTY)
+
+            elif type_ == FUNC and subtype == CLOSE:
+                token = Token(')', PAREN, CLOSE)
+
+            elif type_ == ARRAY and subtype == OPEN:
+                yield token
+                yield Token('(', PAREN, OPEN)
+                yield Token('', ARRAYROW, OPEN)
+                token = Token('(', PAREN, OPEN)
+
+            elif type_ == ARRAY and subtype == CLOSE:
+                yield token
+                token = Token(')', PAREN, CLOSE)
+
+            elif type_ == SEP and subtype == ROW:
+                yield Token(')', PAREN, CLOSE)
+                yield Token(',', SEP, ARG)
+                yield Token('', ARRAYROW, OPEN)
+                token = Token('(', PAREN, OPEN)
+
+            elif type_ == SEP and subtype == ARG:
+                if next_token.matches(SEP, ARG) or \
+                        next_token.matches(FUNC, CLOSE):
+                    yield token
+                    token = Token('', OPERAND, EMPTY)
+
+            elif type_ == PAREN and subtype == OPEN:
+                token = Token('(', PAREN, OPEN)
+
+            elif type_ == PAREN and subtype == CLOSE:
+                token = Token(')', PAREN, CLOSE)
+
+            yield token
+
     def _parse_to_rpn(self, expression):
         """
         Parse an excel formula expression into reverse polish notation
@@ -647,122 +834,92 @@ class ExcelFormula:
             algorithm-to-allow-variable-numbers-of-arguments-to-functions/
         """
 
-        lexer = Tokenizer(expression)
-
-        # amend token stream to ease code production
-        tokens = []
-        for token, next_token in zip(lexer.items, lexer.items[1:] + [None]):
-
-            if token.matches(Token.FUNC, Token.OPEN):
-                tokens.append(token)
-                token = Token('(', Token.PAREN, Token.OPEN)
-                if next_token.matches(Token.SEP, Token.ARG):
-                    tokens.append(token)
-                    token = Token('', Token.OPERAND, Token.EMPTY)
-
-            elif token.matches(Token.FUNC, Token.CLOSE):
-                token = Token(')', Token.PAREN, Token.CLOSE)
-
-            elif token.matches(Token.ARRAY, Token.OPEN):
-                tokens.append(token)
-                tokens.append(Token('(', Token.PAREN, Token.OPEN))
-                tokens.append(Token('', Token.ARRAYROW, Token.OPEN))
-                token = Token('(', Token.PAREN, Token.OPEN)
-
-            elif token.matches(Token.ARRAY, Token.CLOSE):
-                tokens.append(token)
-                token = Token(')', Token.PAREN, Token.CLOSE)
-
-            elif token.matches(Token.SEP, Token.ROW):
-                tokens.append(Token(')', Token.PAREN, Token.CLOSE))
-                tokens.append(Token(',', Token.SEP, Token.ARG))
-                tokens.append(Token('', Token.ARRAYROW, Token.OPEN))
-                token = Token('(', Token.PAREN, Token.OPEN)
-
-            elif token.matches(Token.SEP, Token.ARG):
-                if next_token.matches(Token.SEP, Token.ARG) or \
-                        next_token.matches(Token.FUNC, Token.CLOSE):
-                    tokens.append(token)
-                    token = Token('', Token.OPERAND, Token.EMPTY)
-
-            elif token.matches(Token.PAREN, Token.OPEN):
-                token.value = '('
-
-            elif token.matches(Token.PAREN, Token.CLOSE):
-                token.value = ')'
-
-            tokens.append(token)
+        OPERAND = Token.OPERAND
+        PAREN = Token.PAREN
+        FUNC = Token.FUNC
+        ARRAY = Token.ARRAY
+        ARRAYROW = Token.ARRAYROW
+        SEP = Token.SEP
+        ast_node = self._ast_node
 
         output = []
         stack = []
         were_values = []
         arg_count = []
 
-        for token in tokens:
-            if token.type == token.OPERAND:
+        output_append = output.append
+        stack_append = stack.append
+        stack_pop = stack.pop
+        were_values_append = were_values.append
+        were_values_pop = were_values.pop
+        arg_count_append = arg_count.append
+        arg_count_pop = arg_count.pop
+
+        for token in self._rewrite_tokens(_tokenize(expression)):
+            if token.type == OPERAND:
 
-                output.append(self._ast_node(token))
+                output_append(ast_node(token))
                 if were_values:
                     were_values[-1] = True
 
-            elif token.type != token.PAREN and token.subtype == token.OPEN:
+            elif token.flags & F_OPEN and token.type != PAREN:
 
-                if token.type in (token.ARRAY, Token.ARRAYROW):
+                if token.type in (ARRAY, ARRAYROW):
                     token = Token(token.type, token.type, token.subtype)
 
-                stack.append(token)
-                arg_count.append(0)
+                stack_append(token)
+                arg_count_append(0)
                 if were_values:
                     were_values[-1] = True
-                were_values.append(False)
+                were_values_append(False)
 
-            elif token.type == token.SEP:
+            elif token.type == SEP:
 
-                while stack and (stack[-1].subtype != token.OPEN):
-                    output.append(self._ast_node(stack.pop()))
+                while stack and not stack[-1].flags & F_OPEN:
+                    output_append(ast_node(stack_pop()))
 
                 if not len(were_values):
                     raise FormulaParserError("Mismatched or misplaced parentheses")
 
-                were_values.pop()
                 arg_count[-1] += 1
-                were_values.append(False)
+                were_values[-1] = False
 
-            elif token.is_operator:
+            elif token.flags & F_OP:
 
-                while stack and stack[-1].is_operator and (
-                        token.precedence < stack[-1].precedence):
-                    output.append(self._ast_node(stack.pop()))
+                push_key = token._precedence.push_key
+                while stack and stack[-1].flags & F_OP and (
+                        push_key < stack[-1]._precedence.pop_key):
+                    output_append(ast_node(stack_pop()))
 
-                stack.append(token)
+                stack_append(token)
 
-            elif token.subtype == token.OPEN:
-                assert token.type in (token.FUNC, token.PAREN, token.ARRAY)
-                stack.append(token)
+            elif token.flags & F_OPEN:
+                assert token.type in (FUNC, PAREN, ARRAY)
+                stack_append(token)
 
-            elif token.subtype == token.CLOSE:
+            elif token.flags & F_CLOSE:
 
-                while stack and stack[-1].subtype != Token.OPEN:
-                    output.append(self._ast_node(stack.pop()))
+                while stack and not stack[-1].flags & F_OPEN:
+                    output_append(ast_node(stack_pop()))
 
                 if not stack:
                     raise FormulaParserError("Mismatched or misplaced parentheses")
 
-                stack.pop()
+                stack_pop()
 
-                if stack and stack[-1].is_funcopen:
-                    f = self._ast_node(stack.pop())
-                    f.num_args = arg_count.pop() + int(were_values.pop())
-                    output.append(f)
+                if stack and stack[-1].flags & F_FUNCOPEN:
+                    f = ast_node(stack_pop())
+                    f.num_args = arg_count_pop() + int(were_values_pop())
+                    output_append(f)
 
             else:
-                assert token.type == token.WSPACE, f'Unexpected token: {token}'
+                assert token.type == Token.WSPACE, f'Unexpected token: {token}'
 
         while stack:
-            if stack[-1].subtype in (Token.OPEN, Token.CLOSE):
+            if stack[-1].flags & (F_OPEN | F_CLOSE):
                 raise FormulaParserError("Mismatched or misplaced parentheses")
 
-            output.append(self._ast_node(stack.pop()))
+            output_append(ast_node(stack_pop()))
 
         return output
 
@@ -774,49 +931,41 @@ class ExcelFormula:
         :return: AST which can be used to generate code
         """
 
-        # use a directed graph to store the syntax tree
-        tree = DiGraph()
-
         # production stack
         stack = []
+        stack_append = stack.append
+        stack_pop = stack.pop
 
         for node in rpn_expression:
-            # The graph does not maintain the order of adding nodes/edges, so
-            # add an attribute 'pos' so we can always sort to the correct order
-
-            node.ast = tree
             if isinstance(node, OperatorNode):
                 if node.token.type == node.token.OP_IN:
                     try:
-                        arg2 = stack.pop()
-                        arg1 = stack.pop()
+                        arg2 = stack_pop()
+                        arg1 = stack_pop()
                     except IndexError:
                         raise FormulaParserError(
                             f"'{node.token.value}' operator missing operand")
-                    tree.add_node(arg1, pos=0)
-                    tree.add_node(arg2, pos=1)
-                    tree.add_edge(arg1, node)
-                    tree.add_edge(arg2, node)
+                    arg1.parent = arg2.parent = node
+                    node.children = [arg1, arg2]
                 else:
                     try:
-                        arg1 = stack.pop()
+                        arg1 = stack_pop()
                     except IndexError:
                         raise FormulaParserError(
                             f"'{node.token.value}' operator missing operand")
-                    tree.add_node(arg1, pos=1)
-                    tree.add_edge(arg1, node)
+                    arg1.parent = node
+                    node.children = [arg1]
 
             elif isinstance(node, FunctionNode):
                 if node.num_args:
-                    args = stack[-node.num_args:]
-                    del stack[-node.num_args:]
-                    for i, a in enumerate(args):
-                        tree.add_node(a, pos=i)
-                        tree.add_edge(a, node)
-            else:
-                tree.add_node(node, pos=0)
-
-            stack.append(node)
+                    # the args slice becomes the children list, no other copy
+                    base = len(stack) - node.num_args
+                    node.children = args = stack[base:]
+                    del stack[base:]
+                    for a in args:
+                        a.parent = node
+
+            stack_append(node)
 
         assert 1 == len(stack)
         return stack[0]
@@ -17,11 +17,13 @@ import numpy as np
 import pytest
 
 from pycel.excelformula import (
+    _emit_range,
     ASTNode,
     ExcelFormula,
     FormulaEvalError,
     FormulaParserError,
     Token,
+    Tokenizer,
     UnknownFunction,
 )
 from pycel.excelutil import (
@@ -413,6 +415,10 @@ reference_inputs = [
         '=OFFSET(L45:O50,1,2,,4)',
         'L45:O50|1|2||4|OFFSET',
         'offset(_REF_("L45:O50"), 1, 2, None, 4)'),
+    FormulaTest(
+        '=OFFSET(B53:D54 C54:E54,1,2)',
+        'B53:D54|C54:E54| |1|2|OFFSET',
+        'offset(_REF_("B53:D54") & _REF_("C54:E54"), 1, 2)'),
 ]
 
 
@@ -525,6 +531,23 @@ def test_table_relative_address(ATestCell):
         assert '_R_("s!A1:A2")' == excel_formula.ast.emit
 
 
+@pytest.mark.parametrize(
+    'addr_str, sheet, expected', (
+        ('A1', '', '_C_("A1")'),
+        ('A1', 's', '_C_("s!A1")'),
+        ('s!A1:B2', '', '_R_("s!A1:B2")'),
+        ('A:A', 's', '_R_("s!A:A")'),
+        ('R1C1', 's', None),
+        ('R[1]C', 's', None),
+        ('A1:B2:C3', 's', None),
+        ('Table[col1]', 's', None),
+        ('a_name', 's', None),
+    )
+)
+def test_emit_range(addr_str, sheet, expected):
+    assert _emit_range(addr_str, sheet) == expected
+
+
 def test_multi_area_ranges(excel, ATestCell):
     cell = ATestCell('A', 1, excel=excel)
 
@@ -548,6 +571,17 @@ def test_str():
     assert '' == str(excel_formula)
 
 
+def test_tokenize_cache():
+    formula = '=SUM((A1:B2), {1,2;3,4}, IF(A1, , 2))'
+    first = ExcelFormula(formula)
+    second = ExcelFormula(formula)
+
+    assert first.rpn is not second.rpn
+    assert stringify_rpn(first.rpn) == stringify_rpn(second.rpn)
+    assert first.python_code == second.python_code
+    assert first.rpn[0].token is second.rpn[0].token
+
+
 def test_descendants():
 
     excel_formula = ExcelFormula('=E54-E48')
@@ -555,11 +589,74 @@ def test_descendants():
     assert descendants == excel_formula.ast.descendants
 
     assert 2 == len(descendants)
-    assert 'OPERAND' == descendants[0][0].type
-    assert 'OPERAND' == descendants[1][0].type
-    assert {'E48', 'E54'} == {
-        descendants[0][0].value, descendants[1][0].value
-    }
+    assert 'OPERAND' == descendants[0].type
+    assert 'OPERAND' == descendants[1].type
+    assert ['E54', 'E48'] == [d.value for d in descendants]
+    assert all(d.parent is excel_formula.ast for d in descendants)
+
+    excel_formula = ExcelFormula('=SUM(A1, -B1)')
+    descendants = excel_formula.ast.descendants
+    assert ['A1', '-', 'B1'] == [d.value for d in descendants]
+    assert descendants[2].parent is descendants[1]
+    assert excel_formula.ast.parent is None
+
+
+@pytest.mark.parametrize(
+    'value, type_, subtype, is_operator, is_funcopen', (
+        ('+', Token.OP_IN, '', True, False),
+        ('-', Token.OP_PRE, '', True, False),
+        ('%', Token.OP_POST, '', True, False),
+        ('SUM(', Token.FUNC, Token.OPEN, False, True),
+        ('{', Token.ARRAY, Token.OPEN, False, True),
+        ('', Token.ARRAYROW, Token.OPEN, False, True),
+        ('(', Token.PAREN, Token.OPEN, False, False),
+        (')', Token.FUNC, Token.CLOSE, False, False),
+        ('A1', Token.OPERAND, Token.RANGE, False, False),
+    )
+)
+def test_token_flags(value, type_, subtype, is_operator, is_funcopen):
+    token = Token(value, type_, subtype)
+    assert token.is_operator is is_operator
+    assert token.is_funcopen is is_funcopen
+    assert Token.from_token(token).flags == token.flags
+
+
+@pytest.mark.parametrize(
+    'value, type_, func_name', (
+        ('SUM(', Token.FUNC, 'sum'),
+        ('_xlfn.STDEV.S(', Token.FUNC, 'stdev_s'),
+        ('_XLFN_(', Token.FUNC, '_XLFN_'),
+        ('ARRAY', Token.ARRAY, 'array'),
+        ('(', Token.PAREN, None),
+    )
+)
+def test_token_func_name(value, type_, func_name):
+    assert Token(value, type_, Token.OPEN)._func_name == func_name
+
+
+def test_token_precedence():
+    precedences = Token.precedences.values()
+    for p1 in precedences:
+        for p2 in precedences:
+            assert (p1 < p2) == (
+                p1.precedence < p2.precedence or
+                p1.associativity == 'left' and p1.precedence == p2.precedence
+            )
+
+    assert Token('-', Token.OP_PRE).precedence is Token.precedences['u']
+    assert Token('-', Token.OP_IN).precedence is Token.precedences['-']
+
+
+@mock.patch.dict('pycel.excelformula._TOKEN_CACHE', clear=True)
+def test_token_flyweight():
+    first = Tokenizer('=A1+B1').items
+    second = Tokenizer('=B1+A1').items
+    assert first[0] is second[2]
+    assert first[1] is second[1]
+
+    long_token = Token('LongName', Token.OPERAND, Token.RANGE)
+    assert Token.from_token(long_token) is not long_token
+    assert Token.from_token(long_token).value == long_token.value
 
 
 def test_ast_node():
@@ -572,6 +669,16 @@ def test_ast_node():
     assert 'a_value' == node.emit
 
 
+def test_emit_cache():
+    excel_formula = ExcelFormula('=OFFSET(A1, 1, 1)')
+    ref = excel_formula.ast.children[0]
+
+    with mock.patch.object(type(ref), '_emit', return_value='_C_("A1")') as emit:
+        assert excel_formula.python_code == 'offset(_REF_("A1"), 1, 1)'
+        assert ref.emit == '_C_("A1")'
+    assert emit.call_count == 1
+
+
 def test_if_args_error():
     eval_context = ExcelFormula.build_eval_context(lambda x: 1, lambda x: 1)
 